@@ -1,3 +1,5 @@
+import queue
+import threading
 from sshkeyboard import listen_keyboard
 
 import gym
@@ -20,12 +22,39 @@ print(
 key_actions = {'up': 2, 'down': 3, 'left': 0, 'right': 1}
 key_symbols = {'up': '↑', 'down': '↓', 'left': '←', 'right': '→'}
 
+# holds only the most recent key press, older presses are dropped while the robot is busy
+key_queue = queue.Queue(maxsize=1)
+
+def put_latest(key):
+    try:
+        key_queue.get_nowait()
+    except queue.Empty:
+        pass
+    key_queue.put(key)
+
+def press(key):
+    put_latest(key)
+
+def listen():
+    # a single keyboard listener lives in the background for the whole session
+    # sequential callbacks keep put_latest from racing with itself
+    listen_keyboard(on_press=press, until='esc', sequential=True)
+    put_latest(None)
+
 # create the envronment and establish connection
 env = gym.make('OffWorldMonolithDiscreteReal-v0', experiment_name='Manual control',
                resume_experiment=False, channel_type=Channels.DEPTH_ONLY,
                learning_type=LearningType.END_TO_END, algorithm_mode=AlgorithmMode.TRAIN)
 
-def press(key):
+listener = threading.Thread(target=listen, daemon=True)
+listener.start()
+
+print ("  ← ↑ → ↓ 'esc'", end="\r")
+while True:
+    key = key_queue.get()
+    if key is None:
+        break
+
     if key not in key_actions.keys():
         print("Unknown action, please use arrows to navigate or Esc to exit")
 
@@ -37,5 +66,4 @@ def press(key):
     
     print ("  ← ↑ → ↓ 'esc'", end="\r")
 
-print ("  ← ↑ → ↓ 'esc'", end="\r")
-listen_keyboard(on_press=press, sequential=True)
+listener.join()
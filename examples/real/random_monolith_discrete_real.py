@@ -13,9 +13,7 @@
 # without warranties or conditions of any kind, express or implied.
 
 import numpy as np
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pylab as plt
+import cv2
 
 import gym
 import offworld_gym
@@ -28,10 +26,32 @@ env = gym.make('OffWorldMonolithDiscreteReal-v0', experiment_name='Random agent'
                resume_experiment=False, channel_type=Channels.RGBD,
                learning_type=LearningType.END_TO_END, algorithm_mode=AlgorithmMode.TRAIN)
 
-# initialize figure for drawing RGB and D inputs
-fig, (ax1, ax2) = plt.subplots(1, 2);
-plt.ion();
-plt.show();
+# cv2.imshow is tried first; headless OpenCV builds fall back to matplotlib
+rgb_plot, depth_plot = None, None
+
+def show_state(state):
+    global rgb_plot, depth_plot
+    rgb = np.array(state[0, :, :, :3], dtype=np.uint8)
+    depth = np.array(state[0, :, :, 3], dtype=np.float32)
+    if rgb_plot is None:
+        try:
+            cv2.imshow('RGB', cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+            cv2.imshow('Depth', cv2.normalize(depth, None, 0.0, 1.0, cv2.NORM_MINMAX))
+            cv2.waitKey(1)
+            return
+        except cv2.error:
+            import matplotlib.pyplot as plt
+            plt.ion()
+            _, (ax1, ax2) = plt.subplots(1, 2)
+            rgb_plot = ax1.imshow(rgb)
+            depth_plot = ax2.imshow(depth, cmap='gray')
+            plt.show(block=False)
+    else:
+        rgb_plot.set_data(rgb)
+        depth_plot.set_data(depth)
+        depth_plot.autoscale()
+    rgb_plot.figure.canvas.draw_idle()
+    rgb_plot.figure.canvas.flush_events()
 
 # env.reset()
 
@@ -42,10 +62,7 @@ while True:
         state, reward, done, _ = env.step(env.action_space.sample())
 
         # display the state
-        ax1.imshow(np.array(state[0, :, :, :3], dtype='int'));
-        ax2.imshow(np.array(state[0, :, :, 3]), cmap='gray');
-        plt.draw();
-        plt.pause(0.001);
+        show_state(state)
 
         # print out action outcome
         print("Step reward:", reward)
@@ -16,6 +16,8 @@ from offworld_gym import version
 
 __version__     = version.__version__
 
+import threading
+
 class UniqueDict(dict):
     """A dictionary with unique keys
 
@@ -25,4 +27,40 @@ class UniqueDict(dict):
     def __setitem__(self, key, value):
         if key not in self.keys():
             dict.__setitem__(self, key, value)
-        ## Ignore a duplicate key silently
\ No newline at end of file
+        ## Ignore a duplicate key silently
+
+class LatestValue(object):
+    """A thread safe holder of the most recent value
+
+    Writers replace the value, so a slow reader always sees the latest one
+    instead of working through a backlog. Readers can block until a value
+    they accept has been written.
+    """
+
+    def __init__(self):
+        self._value = None
+        self._condition = threading.Condition()
+
+    def set(self, value):
+        with self._condition:
+            self._value = value
+            self._condition.notify_all()
+
+    def get(self):
+        with self._condition:
+            return self._value
+
+    def wait_for(self, predicate, timeout=None):
+        """Block until the held value satisfies the predicate.
+
+        Args:
+            predicate: Callable accepting the value and returning a boolean.
+            timeout: Float number of seconds to wait, None waits forever.
+
+        Returns:
+            The accepted value, None if the wait timed out.
+        """
+        with self._condition:
+            if self._condition.wait_for(lambda: self._value is not None and predicate(self._value), timeout):
+                return self._value
+            return None
@@ -42,6 +42,7 @@ if gazebo_gym_python_dependencies is not None:
 
 import rospy
 import rospkg
+from offworld_gym.envs.gazebo.utils import GazeboUtils
 
 
 class GazeboGymEnv(gym.Env, metaclass=ABCMeta):
@@ -53,6 +54,8 @@ class GazeboGymEnv(gym.Env, metaclass=ABCMeta):
         node_name: String with a ROS node name for the environment's node
     """
     metadata = {'render.modes': ['human']}
+    _LINGERING_PROCESS_NAMES = {'gzclient', 'gzserver', 'rosmaster', 'roscore'}
+    _LINGERING_PROCESS_TIMEOUT_SECONDS = 2
 
     def __init__(self, package_name, launch_file, node_name='gym_offworld_env'):
 
@@ -69,6 +72,8 @@ class GazeboGymEnv(gym.Env, metaclass=ABCMeta):
             import traceback
             traceback.print_exc()
 
+        GazeboUtils.initialize()
+
     def launch_node(self):
         """Launches the gazebo world 
 
@@ -133,10 +138,21 @@ class GazeboGymEnv(gym.Env, metaclass=ABCMeta):
             import traceback
             traceback.print_exc()
         
-        #force any lingering processes to shutdown
-        os.system("killall -9 -u `whoami` gzclient")
-        os.system("killall -9 -u `whoami` gzserver")
-        os.system("killall -9 -u `whoami` rosmaster")
-        os.system("killall -9 -u `whoami` roscore")
+        #force any lingering processes owned by this user to shutdown
+        uid = os.getuid()
+        lingering = [process for process in psutil.process_iter(['name', 'uids'])
+                     if process.info['name'] in self._LINGERING_PROCESS_NAMES
+                     and process.info['uids'] is not None and process.info['uids'].real == uid]
+        for process in lingering:
+            try:
+                process.terminate()
+            except psutil.NoSuchProcess:
+                pass
+        _, alive = psutil.wait_procs(lingering, timeout=self._LINGERING_PROCESS_TIMEOUT_SECONDS)
+        for process in alive:
+            try:
+                process.kill()
+            except psutil.NoSuchProcess:
+                pass
 
 
@@ -19,8 +19,8 @@ __version__     = version.__version__
 #lib
 from math import pi
 import time
+import logging
 import numpy as np
-from scipy.spatial import distance
 import pdb
 from pyquaternion import Quaternion
 from matplotlib import pyplot as plt
@@ -34,6 +34,7 @@ from offworld_gym.envs.gazebo.utils import ImageUtils, GazeboUtils
 from offworld_gym.envs.common.exception.gym_exception import GymException
 from offworld_gym.envs.common.channels import Channels
 from offworld_gym.envs.common.actions import FourDiscreteMotionActions
+from offworld_gym.envs.common.data_structures import LatestValue
 
 #ros
 import rospy
@@ -45,6 +46,9 @@ from gazebo_msgs.msg import ModelState
 from sensor_msgs.msg import Image
 from rosgraph_msgs.msg import Clock
 
+# rospy logs through this logger, checked before formatting per-step messages
+_ros_logger = logging.getLogger('rosout')
+
 
 class OffWorldMonolithEnv(GazeboGymEnv):
     """Generic Simulated gym environment that replicates the real OffWorld Monolith environment in Gazebo.
@@ -59,11 +63,16 @@ class OffWorldMonolithEnv(GazeboGymEnv):
         step_count: An integer count of step during an episode.
         observation_space: Gym data structure that encapsulates an observation.
         action_space: Gym data structure that encapsulates an action.
+        render_fps: Optional maximum number of renders per second in 'human' mode, None renders without waiting.
     """
     _PROXIMITY_THRESHOLD = 0.50
     _EPISODE_LENGTH = 100
     _STEP_DURATION_SECONDS_IN_SIM = 1.0
     _MAX_TOLERABLE_ROSLAUNCH_INIT_SECONDS = 20
+    _MAX_TOLERABLE_MOVE_WALL_SECONDS = 20
+    _IMAGE_SUBSCRIBER_BUFF_SIZE = 2**24
+    # the world is paused when the state is read, so this only covers frames still in flight
+    _MAX_TOLERABLE_IMAGE_WAIT_SECONDS = 0.1
     _WALL_BOUNDARIES = {"x_max": 1.90, "x_min": -1.75, "y_max": 1.10, "y_min": -1.60}
 
     def __init__(self, channel_type=Channels.DEPTH_ONLY, random_init=True):
@@ -93,27 +102,40 @@ class OffWorldMonolithEnv(GazeboGymEnv):
             self._latest_clock_message = msg
         self.clock_sub = rospy.Subscriber('/clock', Clock, update_sim_time_from_clock, queue_size=1)
 
-        self._latest_depth_img = None
-        def update_depth_img(msg):
-            self._latest_depth_img = msg
-        self.depth_sub = rospy.Subscriber('/camera/depth/image_raw', Image, update_depth_img, queue_size=1)
-
-        self._latest_rgb_img = None
-        def update_rgb_img(msg):
-            self._latest_rgb_img = msg
-        self.depth_sub = rospy.Subscriber('/camera/rgb/image_raw', Image, update_rgb_img, queue_size=1)
+        # subscriber callbacks only keep the latest message, images are processed on demand by _get_state
+        # the camera period in sim-time is measured from the stamps of consecutive frames, keeping the
+        # largest one so a camera that skips updates still delivers a frame within the period
+        self._camera_period = None
+        def keep_latest_img(latest_img):
+            def img_call(msg):
+                previous = latest_img.get()
+                if previous is not None and msg.header.stamp > previous.header.stamp:
+                    period = (msg.header.stamp - previous.header.stamp).to_sec()
+                    if self._camera_period is None or period > self._camera_period:
+                        self._camera_period = period
+                latest_img.set(msg)
+            return img_call
+
+        self._latest_depth_img = LatestValue()
+        # buff_size must hold a whole frame, otherwise rospy hands out the oldest queued image instead of the latest
+        self.depth_sub = rospy.Subscriber('/camera/depth/image_raw', Image, keep_latest_img(self._latest_depth_img), queue_size=1,
+                                          buff_size=self._IMAGE_SUBSCRIBER_BUFF_SIZE, tcp_nodelay=True)
+
+        self._latest_rgb_img = LatestValue()
+        self.rgb_sub = rospy.Subscriber('/camera/rgb/image_raw', Image, keep_latest_img(self._latest_rgb_img), queue_size=1,
+                                        buff_size=self._IMAGE_SUBSCRIBER_BUFF_SIZE, tcp_nodelay=True)
 
         while self._latest_clock_message is None:
             if time.time() - before_ros_init > self._MAX_TOLERABLE_ROSLAUNCH_INIT_SECONDS:
                 raise GymException("ROS took too long to publish to /clock")
             time.sleep(0.1)
 
-        while self._latest_depth_img is None:
+        while self._latest_depth_img.get() is None:
             if time.time() - before_ros_init > self._MAX_TOLERABLE_ROSLAUNCH_INIT_SECONDS:
                 raise GymException("ROS took too long to publish to /camera/depth/image_raw")
             time.sleep(0.1)
 
-        while self._latest_depth_img is None:
+        while self._latest_rgb_img.get() is None:
             if time.time() - before_ros_init > self._MAX_TOLERABLE_ROSLAUNCH_INIT_SECONDS:
                 raise GymException("ROS took too long to publish to /camera/rgb/image_raw")
             time.sleep(0.1)
@@ -134,6 +156,17 @@ class OffWorldMonolithEnv(GazeboGymEnv):
         self.random_init = random_init
         self.step_count = 0
         self._current_state = None
+        self.render_fps = None
+        self._plot_image = None
+        self._last_plot_time = 0.0
+        self._last_move_sim_time = None
+        if channel_type == Channels.RGBD:
+            # both images go into reusable buffers, the concatenated state is a fresh array
+            self._process_rgb_msg = ImageUtils.img_preprocessor(out=np.empty((1, ImageUtils.IMG_H, ImageUtils.IMG_W, 3), dtype=np.uint8))
+            self._process_depth_msg = ImageUtils.depth_preprocessor(out=np.empty((1, ImageUtils.IMG_H, ImageUtils.IMG_W, 1), dtype=np.float32))
+        else:
+            self._process_rgb_msg = ImageUtils.img_preprocessor()
+            self._process_depth_msg = ImageUtils.depth_preprocessor()
 
         self.observation_space = spaces.Box(0, 255, shape = (1, ImageUtils.IMG_H, ImageUtils.IMG_W, channel_type.value))
         self.action_space = None
@@ -145,13 +178,20 @@ class OffWorldMonolithEnv(GazeboGymEnv):
         rospy.logdebug("----------------------------------------")
         rospy.loginfo("Environment has been started.")
 
-    def _sim_time_sleep(self, sleep_seconds):
-        before_sleep_sim_time_secs = self._latest_clock_message.clock.secs + self._latest_clock_message.clock.nsecs/1e+9
-        while True:
+    def _get_sim_time(self):
+        return self._latest_clock_message.clock.secs + self._latest_clock_message.clock.nsecs/1e+9
+
+    def _sim_time_wait_until(self, sim_time_secs, timeout):
+        """Wait until /clock reaches a sim-time.
+
+        Raises:
+            GymException: The sim-time was not reached within ``timeout`` wall-clock seconds.
+        """
+        deadline = time.time() + timeout
+        while self._get_sim_time() < sim_time_secs:
+            if time.time() > deadline:
+                raise GymException("Simulation did not advance to %.3f seconds of sim-time within %.1f seconds." % (sim_time_secs, timeout))
             time.sleep(0.0001)
-            cur_sim_time_sec = self._latest_clock_message.clock.secs + self._latest_clock_message.clock.nsecs/1e+9
-            if cur_sim_time_sec - before_sleep_sim_time_secs > sleep_seconds:
-                break
 
     def seed(self, seed=None):
         """Calls ``gym`` strong random seed generator.
@@ -162,20 +202,45 @@ class OffWorldMonolithEnv(GazeboGymEnv):
         self.np_random, seed = seeding.np_random(seed)
         return [seed]
 
-    def _get_state(self):
+    def _wait_for_image(self, latest_img, newer_than=None, deadline=None):
+        """Get the latest image message, waiting for one captured after a given sim-time.
+
+        Args:
+            latest_img: LatestValue holding the latest message of an image topic.
+            newer_than: rospy.Time the image must be stamped after, None accepts any image.
+            deadline: Wall-clock time to stop waiting at, ``_MAX_TOLERABLE_IMAGE_WAIT_SECONDS`` from now if None.
+
+        Returns:
+            The image message, the latest available one if no newer image arrived in time.
+        """
+        if newer_than is None:
+            return latest_img.get()
+        if deadline is None:
+            deadline = time.time() + self._MAX_TOLERABLE_IMAGE_WAIT_SECONDS
+        msg = latest_img.wait_for(lambda msg: msg.header.stamp > newer_than, timeout=max(0.0, deadline - time.time()))
+        if msg is None:
+            rospy.logwarn("No camera image from the end of the last move has been received, using the latest one.")
+            msg = latest_img.get()
+        return msg
+
+    def _get_state(self, newer_than=None):
         """Encapsulates state of the environment as captured by an rgbd sensor in a numpy array.
 
+        Args:
+            newer_than: rospy.Time the camera images must be stamped after, None accepts any image.
+
         Returns:
             Numpy array with the state of the environment as captured by the robot's rgbd sensor.
         """
-        rgb_img = ImageUtils.process_img_msg(self._latest_rgb_img)
-        depth_img = ImageUtils.process_depth_msg(self._latest_depth_img)
-
+        # one deadline bounds the waits for all images of the state
+        deadline = time.time() + self._MAX_TOLERABLE_IMAGE_WAIT_SECONDS
         if self.channel_type == Channels.DEPTH_ONLY:
-            state = depth_img
+            state = self._process_depth_msg(self._wait_for_image(self._latest_depth_img, newer_than, deadline))
         elif self.channel_type == Channels.RGB_ONLY:
-            state = rgb_img
+            state = self._process_rgb_msg(self._wait_for_image(self._latest_rgb_img, newer_than, deadline))
         elif self.channel_type == Channels.RGBD:
+            rgb_img = self._process_rgb_msg(self._wait_for_image(self._latest_rgb_img, newer_than, deadline))
+            depth_img = self._process_depth_msg(self._wait_for_image(self._latest_depth_img, newer_than, deadline))
             state = np.concatenate((rgb_img, depth_img), axis=-1)
         rospy.loginfo("State of the environment captured.")
         return state
@@ -189,7 +254,7 @@ class OffWorldMonolithEnv(GazeboGymEnv):
         Args:
             lin_x_speed: Float value indicating linear speed in x-direction.
             ang_z_speed: Float value indicating angular speed about z-direction.
-            sleep_time: Float value indicating sleep time between velocity command and stopping.
+            sleep_time: Float value indicating sim-time duration between velocity command and stopping.
         Returns:
             The real time factor for the move (sim-time elapsed/wall-time elapsed)
         """
@@ -200,9 +265,18 @@ class OffWorldMonolithEnv(GazeboGymEnv):
 
         GazeboUtils.unpause_physics()
         wall_start = time.time()
-        self._sim_time_sleep(sleep_time)  # action duration is in sim-time, so simulation speed has no affect on env dynamics
-        wall_stop = time.time()
-        GazeboUtils.pause_physics()
+        target_sim_time = self._get_sim_time() + sleep_time
+        try:
+            # action duration is in sim-time, so simulation speed has no affect on env dynamics
+            self._sim_time_wait_until(target_sim_time, self._MAX_TOLERABLE_MOVE_WALL_SECONDS)
+            wall_stop = time.time()
+        finally:
+            GazeboUtils.pause_physics()
+
+        # the paused world renders no new frames, so the last one of the move is at most one camera
+        # period old, any image of the move is accepted until the period has been measured
+        camera_period = self._camera_period if self._camera_period is not None else sleep_time
+        self._last_move_sim_time = rospy.Time.from_sec(max(0.0, target_sim_time - camera_period))
 
         wall_sleep_time = wall_stop - wall_start
         real_time_factor = sleep_time / wall_sleep_time
@@ -256,7 +330,7 @@ class OffWorldMonolithEnv(GazeboGymEnv):
             A boolean flag which is true when an episode is complete.
         """
         rosbot_state = self._get_state_vector('rosbot')
-        dst = distance.euclidean(rosbot_state[0:3], self._monolith_space[0:3])
+        dst = np.linalg.norm(np.subtract(rosbot_state[0:3], self._monolith_space[0:3]))
         rospy.logdebug("Distance between the rosbot and the monolith is : {}".format(str(dst)))
 
         # check distance to the monolith
@@ -300,7 +374,7 @@ class OffWorldMonolithEnv(GazeboGymEnv):
             # random spawn location exlucing no-spawn 30cm radius around the monolith
             goal_state.pose.position.x = self._monolith_space[0]
             goal_state.pose.position.y = self._monolith_space[1]
-            while distance.euclidean((goal_state.pose.position.x, goal_state.pose.position.y), self._monolith_space[0:2]) < 0.50:
+            while np.linalg.norm(np.subtract((goal_state.pose.position.x, goal_state.pose.position.y), self._monolith_space[0:2])) < 0.50:
                 goal_state.pose.position.x = np.random.uniform(low=self._WALL_BOUNDARIES['x_min'] + 0.08,
                                                                high=self._WALL_BOUNDARIES['x_max'] - 0.08)
                 goal_state.pose.position.y = np.random.uniform(low=self._WALL_BOUNDARIES['y_min'] + 0.08,
@@ -372,7 +446,7 @@ class OffWorldMonolithEnv(GazeboGymEnv):
             None if mode is 'human', an NDArray image if mode is 'array'
         """
         if mode == 'human':
-            self.plot(self._current_state)
+            self.plot(self._current_state, fps=self.render_fps)
         elif mode == 'array':
             if self._current_state is not None:
                 return self._current_state
@@ -380,23 +454,36 @@ class OffWorldMonolithEnv(GazeboGymEnv):
         else:
             raise NotImplementedError(mode)
 
-    def plot(self, img, id=1, title="State"):
+    def plot(self, img, id=1, title="State", fps=None):
         """Plot an image in a non-blocking way.
 
+        The figure is created on the first call and updated in place afterwards.
 
         Args:
             img: A numpy array containing the observation.
             id: Numeric id which is assigned to the pyplot figure.
             title: String value which is used as the title.
+            fps: Optional maximum number of plots per second, None plots without waiting.
         """
         if img is not None and isinstance(img, np.ndarray):
-            plt.figure(id)
-            plt.ion()
-            plt.clf()
-            plt.imshow(img.squeeze())
-            plt.title(title)
-            plt.show(block=False)
-            plt.pause(0.05)
+            if fps is not None:
+                remaining = self._last_plot_time + 1.0 / fps - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+            if self._plot_image is None or self._plot_image.figure.number != id or not plt.fignum_exists(id):
+                plt.ion()
+                figure = plt.figure(id)
+                figure.clf()
+                self._plot_image = figure.gca().imshow(img.squeeze())
+                plt.show(block=False)
+            else:
+                # update the existing image instead of allocating a new one on every render
+                self._plot_image.set_data(img.squeeze())
+                self._plot_image.autoscale()
+            self._plot_image.axes.set_title(title)
+            self._plot_image.figure.canvas.draw_idle()
+            self._plot_image.figure.canvas.flush_events()
+            self._last_plot_time = time.monotonic()
 
 class OffWorldMonolithDiscreteEnv(OffWorldMonolithEnv):
     """Discrete version of the simulated gym environment that replicates the real OffWorld Monolith environment in Gazebo.
@@ -407,6 +494,7 @@ class OffWorldMonolithDiscreteEnv(OffWorldMonolithEnv):
         env = gym.make('OffWorldMonolithDiscreteSim-v0', channel_type=Channels.RGB_ONLY, random_init=True)
         env = gym.make('OffWorldMonolithDiscreteSim-v0', channel_type=Channels.RGBD, random_init=True)
     """
+    _ACTION_LUT = tuple(FourDiscreteMotionActions(i) for i in range(4))
 
     def __init__(self, channel_type=Channels.DEPTH_ONLY, random_init=True):
         super(OffWorldMonolithDiscreteEnv, self).__init__(channel_type=channel_type, random_init=random_init)
@@ -444,20 +532,19 @@ class OffWorldMonolithDiscreteEnv(OffWorldMonolithEnv):
         self.step_count += 1
 
         assert action is not None, "Action cannot be None."
-        # convert float if it's exactly an integer value, otherwise let it throw an error
-        if isinstance(action, (float, np.float32, np.float64)) and float(action).is_integer():
-            action = int(action)
-        assert isinstance(action, (FourDiscreteMotionActions, int, np.int32, np.int64)), "Action type is not recognized."
-
-        if isinstance(action, (int, np.int32, np.int64)):
-            assert action >= 0 and action < 4, "Unrecognized value for the action"
-            action = FourDiscreteMotionActions(action)
-
-        rospy.loginfo("Step: %d" % self.step_count)
-        rospy.loginfo(action)
+        # integer values, including integral floats, are looked up instead of constructing the enum
+        if not isinstance(action, FourDiscreteMotionActions):
+            assert isinstance(action, (int, float, np.integer, np.floating)) and np.isfinite(action), "Action type is not recognized."
+            index = int(action)
+            assert index == action and 0 <= index < len(self._ACTION_LUT), "Unrecognized value for the action"
+            action = self._ACTION_LUT[index]
+
+        if _ros_logger.isEnabledFor(logging.INFO):
+            rospy.loginfo("Step: %d" % self.step_count)
+            rospy.loginfo(action)
         real_time_factor_for_move = self._send_action_commands(action)
 
-        self._current_state = self._get_state()
+        self._current_state = self._get_state(newer_than=self._last_move_sim_time)
         info = {"real_time_factor_for_move": real_time_factor_for_move}
         reward, done = self._calculate_reward()
 
@@ -499,11 +586,12 @@ class OffWorldMonolithContinuousEnv(OffWorldMonolithEnv):
         assert action is not None, "Action cannot be None."
         assert isinstance(action, (np.ndarray)), "Action type is not recognized."
         action = np.clip(action, self.action_limit[0], self.action_limit[1])
-        rospy.loginfo("Step: %d" % self.step_count)
-        rospy.loginfo(action)
+        if _ros_logger.isEnabledFor(logging.INFO):
+            rospy.loginfo("Step: %d" % self.step_count)
+            rospy.loginfo(action)
         real_time_factor_for_move = self._move_rosbot(action[0], action[1], self._STEP_DURATION_SECONDS_IN_SIM)
 
-        self._current_state = self._get_state()
+        self._current_state = self._get_state(newer_than=self._last_move_sim_time)
         info = {"real_time_factor_for_move": real_time_factor_for_move}
         reward, done = self._calculate_reward()
 
@@ -19,8 +19,8 @@ __version__     = version.__version__
 #lib
 from math import pi
 import time
+import logging
 import numpy as np
-from scipy.spatial import distance
 import pdb
 from pyquaternion import Quaternion
 from matplotlib import pyplot as plt
@@ -45,6 +45,9 @@ from gazebo_msgs.msg import ModelState
 from sensor_msgs.msg import Image
 from rosgraph_msgs.msg import Clock
 
+# rospy logs through this logger, checked before formatting per-step messages
+_ros_logger = logging.getLogger('rosout')
+
 class OffWorldMonolithObstacleEnv(GazeboGymEnv):
     """Generic Simulated gym environment that replicates the real OffWorld Monolith Obstacle environment in Gazebo.
 
@@ -58,11 +61,13 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
         step_count: An integer count of step during an episode.
         observation_space: Gym data structure that encapsulates an observation.
         action_space: Gym data structure that encapsulates an action.
+        render_fps: Optional maximum number of renders per second in 'human' mode, None renders without waiting.
     """
     _PROXIMITY_THRESHOLD = 0.50
     _EPISODE_LENGTH = 100
     _STEP_DURATION_SECONDS_IN_SIM = 1.0
     _MAX_TOLERABLE_ROSLAUNCH_INIT_SECONDS = 20
+    _MAX_TOLERABLE_MOVE_WALL_SECONDS = 20
     _WALL_BOUNDARIES = {"x_max": 1.90, "x_min": -1.75, "y_max": 1.10, "y_min": -1.60}
 
     def __init__(self, channel_type=Channels.DEPTH_ONLY, random_init=True):
@@ -115,6 +120,11 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
         self.random_init = random_init
         self.step_count = 0
         self._current_state = None
+        self.render_fps = None
+        self._plot_image = None
+        self._last_plot_time = 0.0
+        self._process_rgb_msg = ImageUtils.img_preprocessor()
+        self._process_depth_msg = ImageUtils.depth_preprocessor()
 
         self.observation_space = spaces.Box(0, 255, shape = (1, ImageUtils.IMG_H, ImageUtils.IMG_W, channel_type.value))
         self.action_space = None
@@ -127,13 +137,20 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
         rospy.logdebug("----------------------------------------")
         rospy.loginfo("Environment has been started.")
 
-    def _sim_time_sleep(self, sleep_seconds):
-        before_sleep_sim_time_secs = self._latest_clock_message.clock.secs + self._latest_clock_message.clock.nsecs/1e+9
-        while True:
+    def _get_sim_time(self):
+        return self._latest_clock_message.clock.secs + self._latest_clock_message.clock.nsecs/1e+9
+
+    def _sim_time_wait_until(self, sim_time_secs, timeout):
+        """Wait until /clock reaches a sim-time.
+
+        Raises:
+            GymException: The sim-time was not reached within ``timeout`` wall-clock seconds.
+        """
+        deadline = time.time() + timeout
+        while self._get_sim_time() < sim_time_secs:
+            if time.time() > deadline:
+                raise GymException("Simulation did not advance to %.3f seconds of sim-time within %.1f seconds." % (sim_time_secs, timeout))
             time.sleep(0.0001)
-            cur_sim_time_sec = self._latest_clock_message.clock.secs + self._latest_clock_message.clock.nsecs/1e+9
-            if cur_sim_time_sec - before_sleep_sim_time_secs > sleep_seconds:
-                break
 
     def seed(self, seed=None):
         """Calls ``gym`` strong random seed generator.
@@ -155,7 +172,7 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
         while rgb_data is None and not rospy.is_shutdown():
             try:
                 rgb_data = rospy.wait_for_message('/camera/rgb/image_raw', Image, timeout=5)
-                rgb_img = ImageUtils.process_img_msg(rgb_data)
+                rgb_img = self._process_rgb_msg(rgb_data)
             except rospy.ROSException:
                 rospy.sleep(0.1)
 
@@ -164,7 +181,7 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
         while depth_data is None and not rospy.is_shutdown():
             try:
                 depth_data = rospy.wait_for_message('/camera/depth/image_raw', Image, timeout=5)
-                depth_img = ImageUtils.process_depth_msg(depth_data)
+                depth_img = self._process_depth_msg(depth_data)
             except rospy.ROSException:
                 rospy.sleep(0.1)
 
@@ -186,7 +203,7 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
         Args:
             lin_x_speed: Float value indicating linear speed in x-direction.
             ang_z_speed: Float value indicating angular speed about z-direction.
-            sleep_time: Float value indicating sleep time between velocity command and stopping.
+            sleep_time: Float value indicating sim-time duration between velocity command and stopping.
         Returns:
             The real time factor for the move (sim-time elapsed/wall-time elapsed)
         """
@@ -197,9 +214,12 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
 
         GazeboUtils.unpause_physics()
         wall_start = time.time()
-        self._sim_time_sleep(sleep_time)  # action duration is in sim-time, so simulation speed has no affect on env dynamics
-        wall_stop = time.time()
-        GazeboUtils.pause_physics()
+        try:
+            # action duration is in sim-time, so simulation speed has no affect on env dynamics
+            self._sim_time_wait_until(self._get_sim_time() + sleep_time, self._MAX_TOLERABLE_MOVE_WALL_SECONDS)
+            wall_stop = time.time()
+        finally:
+            GazeboUtils.pause_physics()
 
         wall_sleep_time = wall_stop - wall_start
         real_time_factor = sleep_time / wall_sleep_time
@@ -253,7 +273,7 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
             A boolean flag which is true when an episode is complete.
         """
         rosbot_state = self._get_state_vector('rosbot')
-        dst = distance.euclidean(rosbot_state[0:3], self._monolith_space[0:3])
+        dst = np.linalg.norm(np.subtract(rosbot_state[0:3], self._monolith_space[0:3]))
         rospy.logdebug("Distance between the rosbot and the monolith is : {}".format(str(dst)))
 
         # check distance to the monolith
@@ -302,9 +322,9 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
                                                                high=self._WALL_BOUNDARIES['x_max'] - 0.08)
                 goal_state.pose.position.y = np.random.uniform(low=self._WALL_BOUNDARIES['y_min'] + 0.08,
                                                                high=self._WALL_BOUNDARIES['y_max'] - 0.08)
-                flag = distance.euclidean((goal_state.pose.position.x, goal_state.pose.position.y), self._monolith_space[0:2]) > 0.50
+                flag = np.linalg.norm(np.subtract((goal_state.pose.position.x, goal_state.pose.position.y), self._monolith_space[0:2])) > 0.50
                 for pos in self._boulder_poses:
-                    flag = flag and distance.euclidean((goal_state.pose.position.x, goal_state.pose.position.y), (pos[0], pos[1])) > 0.30
+                    flag = flag and np.linalg.norm(np.subtract((goal_state.pose.position.x, goal_state.pose.position.y), (pos[0], pos[1]))) > 0.30
                 if flag:
                     break
 
@@ -370,7 +390,7 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
             None if mode is 'human', an NDArray image if mode is 'array'
         """
         if mode == 'human':
-            self.plot(self._current_state)
+            self.plot(self._current_state, fps=self.render_fps)
         elif mode == 'array':
             if self._current_state is not None:
                 return self._current_state
@@ -378,23 +398,36 @@ class OffWorldMonolithObstacleEnv(GazeboGymEnv):
         else:
             raise NotImplementedError(mode)
 
-    def plot(self, img, id=1, title="State"):
+    def plot(self, img, id=1, title="State", fps=None):
         """Plot an image in a non-blocking way.
 
+        The figure is created on the first call and updated in place afterwards.
 
         Args:
             img: A numpy array containing the observation.
             id: Numeric id which is assigned to the pyplot figure.
             title: String value which is used as the title.
+            fps: Optional maximum number of plots per second, None plots without waiting.
         """
         if img is not None and isinstance(img, np.ndarray):
-            plt.figure(id)
-            plt.ion()
-            plt.clf()
-            plt.imshow(img.squeeze())
-            plt.title(title)
-            plt.show(block=False)
-            plt.pause(0.05)
+            if fps is not None:
+                remaining = self._last_plot_time + 1.0 / fps - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+            if self._plot_image is None or self._plot_image.figure.number != id or not plt.fignum_exists(id):
+                plt.ion()
+                figure = plt.figure(id)
+                figure.clf()
+                self._plot_image = figure.gca().imshow(img.squeeze())
+                plt.show(block=False)
+            else:
+                # update the existing image instead of allocating a new one on every render
+                self._plot_image.set_data(img.squeeze())
+                self._plot_image.autoscale()
+            self._plot_image.axes.set_title(title)
+            self._plot_image.figure.canvas.draw_idle()
+            self._plot_image.figure.canvas.flush_events()
+            self._last_plot_time = time.monotonic()
 
 class OffWorldMonolithObstacleDiscreteEnv(OffWorldMonolithObstacleEnv):
     """Discrete version of the simulated gym environment that replicates the real OffWorld Monolith environment in Gazebo.
@@ -405,6 +438,7 @@ class OffWorldMonolithObstacleDiscreteEnv(OffWorldMonolithObstacleEnv):
         env = gym.make('OffWorldMonolithDiscreteSim-v0', channel_type=Channels.RGB_ONLY, random_init=True)
         env = gym.make('OffWorldMonolithDiscreteSim-v0', channel_type=Channels.RGBD, random_init=True)
     """
+    _ACTION_LUT = tuple(FourDiscreteMotionActions(i) for i in range(4))
 
     def __init__(self, channel_type=Channels.DEPTH_ONLY, random_init=True):
         super(OffWorldMonolithObstacleDiscreteEnv, self).__init__(channel_type=channel_type, random_init=random_init)
@@ -442,17 +476,16 @@ class OffWorldMonolithObstacleDiscreteEnv(OffWorldMonolithObstacleEnv):
         self.step_count += 1
 
         assert action is not None, "Action cannot be None."
-        # convert float if it's exactly an integer value, otherwise let it throw an error
-        if isinstance(action, (float, np.float32, np.float64)) and float(action).is_integer():
-            action = int(action)
-        assert isinstance(action, (FourDiscreteMotionActions, int, np.int32, np.int64)), "Action type is not recognized."
-
-        if isinstance(action, (int, np.int32, np.int64)):
-            assert action >= 0 and action < 4, "Unrecognized value for the action"
-            action = FourDiscreteMotionActions(action)
-
-        rospy.loginfo("Step: %d" % self.step_count)
-        rospy.loginfo(action)
+        # integer values, including integral floats, are looked up instead of constructing the enum
+        if not isinstance(action, FourDiscreteMotionActions):
+            assert isinstance(action, (int, float, np.integer, np.floating)) and np.isfinite(action), "Action type is not recognized."
+            index = int(action)
+            assert index == action and 0 <= index < len(self._ACTION_LUT), "Unrecognized value for the action"
+            action = self._ACTION_LUT[index]
+
+        if _ros_logger.isEnabledFor(logging.INFO):
+            rospy.loginfo("Step: %d" % self.step_count)
+            rospy.loginfo(action)
         real_time_factor_for_move = self._send_action_commands(action)
 
         self._current_state = self._get_state()
@@ -497,8 +530,9 @@ class OffWorldMonolithObstacleContinuousEnv(OffWorldMonolithObstacleEnv):
         assert action is not None, "Action cannot be None."
         assert isinstance(action, (np.ndarray)), "Action type is not recognized."
         action = np.clip(action, self.action_limit[0], self.action_limit[1])
-        rospy.loginfo("Step: %d" % self.step_count)
-        rospy.loginfo(action)
+        if _ros_logger.isEnabledFor(logging.INFO):
+            rospy.loginfo("Step: %d" % self.step_count)
+            rospy.loginfo(action)
         real_time_factor_for_move = self._move_rosbot(action[0], action[1], self._STEP_DURATION_SECONDS_IN_SIM)
 
         self._current_state = self._get_state()
@@ -24,18 +24,68 @@ from cv_bridge import CvBridge, CvBridgeError
 from gazebo_msgs.srv import GetModelState, SetModelState
 from gazebo_msgs.msg import ModelState
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _clip_and_normalize_kernel(flat_img, max_value, inv_max_value):
+        for i in range(flat_img.shape[0]):
+            value = flat_img[i]
+            if value > max_value:
+                value = max_value
+            elif value < 0.0:
+                value = 0.0
+            flat_img[i] = value * inv_max_value
+
+    # compile on import rather than on the first observation
+    _clip_and_normalize_kernel(np.zeros(1, dtype=np.float32), 1.0, np.float32(1.0))
+else:
+    _clip_and_normalize_kernel = None
+
+def _normalization_scale(max_value, full_scale=1.0):
+    """Scale mapping [0, max_value] to [0, full_scale], computed once per preprocessor
+
+    Multiplying by the reciprocal is cheaper than dividing every pixel.
+    """
+    return np.float32(full_scale / max_value)
+
+def _clip_and_normalize(img, max_value, scale):
+    """Clips a float32 image to [0, max_value] and multiplies it by ``scale`` in place
+
+    Uses a single fused pass compiled with numba when it is installed.
+    """
+    if _clip_and_normalize_kernel is not None and img.flags['C_CONTIGUOUS']:
+        _clip_and_normalize_kernel(img.reshape(-1), float(max_value), scale)
+    else:
+        np.clip(img, 0.0, max_value, out=img)
+        np.multiply(img, scale, out=img)
+
 class GazeboUtils:
     """Gazebo utility functions used by the OffWorld Gym environments
     """
 
-    unpause = rospy.ServiceProxy('/gazebo/unpause_physics', Empty_srv)
-    pause = rospy.ServiceProxy('/gazebo/pause_physics', Empty_srv)
+    unpause = rospy.ServiceProxy('/gazebo/unpause_physics', Empty_srv, persistent=True)
+    pause = rospy.ServiceProxy('/gazebo/pause_physics', Empty_srv, persistent=True)
+    set_model_state = rospy.ServiceProxy('/gazebo/set_model_state', SetModelState, persistent=True)
+
+    @staticmethod
+    def initialize():
+        """Wait for the Gazebo services used by the utility functions
+
+        Must be called once after the Gazebo world has been launched, the
+        service proxies are reused afterwards without polling the ROS master.
+        """
+        rospy.wait_for_service('/gazebo/unpause_physics')
+        rospy.wait_for_service('/gazebo/pause_physics')
+        rospy.wait_for_service('/gazebo/set_model_state')
 
     @staticmethod
     def unpause_physics(): 
         """Unpause physics of the Gazebo simulator
         """       
-        rospy.wait_for_service('/gazebo/unpause_physics')
         try:
             GazeboUtils.unpause()
         except rospy.ServiceException:
@@ -45,7 +95,6 @@ class GazeboUtils:
     def pause_physics():
         """Pause physics of the Gazebo simulator
         """
-        rospy.wait_for_service('/gazebo/pause_physics')
         try:
             GazeboUtils.pause()
         except rospy.ServiceException:
@@ -62,9 +111,7 @@ class GazeboUtils:
         """
         try:
             assert isinstance(model_state, ModelState)
-            rospy.wait_for_service('/gazebo/set_model_state')
-            set_model_state = rospy.ServiceProxy('/gazebo/set_model_state', SetModelState)
-            set_model_state(model_state)
+            GazeboUtils.set_model_state(model_state)
         except rospy.ServiceException as e:
             rospy.logerr('The robot cannot be reset.')
             raise e
@@ -76,37 +123,126 @@ class ImageUtils(object):
     IMG_W = 320
     IMG_C = 3
 
+    _bridge = CvBridge()
+
     @staticmethod
-    def process_img_msg(img_msg, resized_width=IMG_W, resized_height=IMG_H, max_value_for_clip_and_normalize=None):
-        """Converts ROS image to cv2, then to numpy
-        """
-        img = CvBridge().imgmsg_to_cv2(img_msg, "bgr8")
-        img = np.asarray(img)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (resized_width, resized_height))
+    def img_preprocessor(resized_width=IMG_W, resized_height=IMG_H, max_value_for_clip_and_normalize=None, out=None):
+        """Builds a function that converts ROS images to numpy with fixed parameters
 
-        img = np.reshape(img, (1, img.shape[0], img.shape[1], img.shape[2]))
+        The size, normalization and output buffer are bound once, so the returned
+        function only takes the message and does not branch on them per frame.
 
-        if max_value_for_clip_and_normalize is not None:
-            img = np.clip(img, a_min=0.0, a_max=max_value_for_clip_and_normalize)
-            img = img / max_value_for_clip_and_normalize
+        Args:
+            resized_width: Integer width in pixels the image is resized to.
+            resized_height: Integer height in pixels the image is resized to.
+            max_value_for_clip_and_normalize: Optional value the image is clipped to before being divided
+                by it, giving float32 values in [0, 1]. None keeps the uint8 image.
+            out: Optional preallocated array of shape (1, resized_height, resized_width, 3) to write
+                the result into, uint8 without normalization and float32 with it. The returned
+                arrays then share memory with ``out``.
+        """
+        bridge = ImageUtils._bridge
+        size = (resized_width, resized_height)
+
+        if max_value_for_clip_and_normalize is None:
+            dst = None if out is None else out[0]
+
+            def process(img_msg):
+                img = cv2.resize(bridge.imgmsg_to_cv2(img_msg, "rgb8"), size, dst=dst)
+                assert img.flags['C_CONTIGUOUS'], "Processed image is expected to be contiguous."
+                return img[np.newaxis]
+        else:
+            max_value = max_value_for_clip_and_normalize
+            scale = _normalization_scale(max_value)
+
+            def process(img_msg):
+                img = cv2.resize(bridge.imgmsg_to_cv2(img_msg, "rgb8"), size)
+                if out is None:
+                    img = img.astype(np.float32)
+                else:
+                    out[0] = img
+                    img = out[0]
+                _clip_and_normalize(img, max_value, scale)
+                assert img.flags['C_CONTIGUOUS'], "Processed image is expected to be contiguous."
+                return img[np.newaxis]
+
+        return process
 
-        return img 
-    
     @staticmethod
-    def process_depth_msg(depth_msg, resized_width=IMG_W, resized_height=IMG_H, max_value_for_clip_and_normalize=None):
-        """Converts a depth image into numpy float32 array
-        """
-        cv_image = CvBridge().imgmsg_to_cv2(depth_msg, "32FC1")
-        img = np.asarray(cv_image, dtype=np.float32)
-        img = np.nan_to_num(img)
-        img = cv2.resize(img, (resized_width, resized_height))
+    def depth_preprocessor(resized_width=IMG_W, resized_height=IMG_H, max_value_for_clip_and_normalize=None, out=None, dtype=np.float32):
+        """Builds a function that converts depth images into numpy arrays with fixed parameters
+
+        The size, normalization and output buffer are bound once, so the returned
+        function only takes the message and does not branch on them per frame.
 
-        img = np.reshape(img, (1, img.shape[0], img.shape[1], 1))
+        Args:
+            resized_width: Integer width in pixels the image is resized to.
+            resized_height: Integer height in pixels the image is resized to.
+            max_value_for_clip_and_normalize: Optional depth the image is clipped to before being divided
+                by it, giving values in [0, 1]. None keeps the raw depth, NaNs are replaced by zero either way.
+            out: Optional preallocated array of shape (1, resized_height, resized_width, 1) and type
+                ``dtype`` to write the result into. The returned arrays then share memory with ``out``.
+            dtype: Type of the returned arrays. An unsigned integer type quantizes the depth in
+                [0, max_value_for_clip_and_normalize] to its full range, e.g. np.uint16 halves the
+                size of float32 observations.
+        """
+        bridge = ImageUtils._bridge
+        size = (resized_width, resized_height)
+        quantize = np.issubdtype(dtype, np.integer)
+        assert not quantize or max_value_for_clip_and_normalize is not None, "Quantizing depth images requires a max value."
+        # quantized images are resized into a float32 temporary, the output buffer has the integer type
+        dst = None if out is None or quantize else out[0, :, :, 0]
+
+        def resize(depth_msg):
+            cv_image = bridge.imgmsg_to_cv2(depth_msg, "32FC1")
+            # scrub NaNs before resizing so the interpolation does not smear them into neighbouring pixels
+            img = np.nan_to_num(cv_image.astype(np.float32, copy=False))
+            return cv2.resize(img, size, dst=dst)
+
+        if max_value_for_clip_and_normalize is None:
+            def process(depth_msg):
+                img = resize(depth_msg)
+                assert img.flags['C_CONTIGUOUS'], "Processed image is expected to be contiguous."
+                return img[np.newaxis, ..., np.newaxis]
+        elif quantize:
+            max_value = max_value_for_clip_and_normalize
+            scale = _normalization_scale(max_value, float(np.iinfo(dtype).max))
+
+            def process(depth_msg):
+                img = resize(depth_msg)
+                _clip_and_normalize(img, max_value, scale)
+                if out is None:
+                    img = img.astype(dtype)
+                else:
+                    np.copyto(out[0, :, :, 0], img, casting='unsafe')
+                    img = out[0, :, :, 0]
+                assert img.flags['C_CONTIGUOUS'], "Processed image is expected to be contiguous."
+                return img[np.newaxis, ..., np.newaxis]
+        else:
+            max_value = max_value_for_clip_and_normalize
+            scale = _normalization_scale(max_value)
+
+            def process(depth_msg):
+                img = resize(depth_msg)
+                # clip and normalize in place on the resized image, no temporaries
+                _clip_and_normalize(img, max_value, scale)
+                assert img.flags['C_CONTIGUOUS'], "Processed image is expected to be contiguous."
+                return img[np.newaxis, ..., np.newaxis]
+
+        return process
 
-        if max_value_for_clip_and_normalize is not None:
-            img = np.clip(img, a_min=0.0, a_max=max_value_for_clip_and_normalize)
-            img = img / max_value_for_clip_and_normalize
+    @staticmethod
+    def process_img_msg(img_msg, resized_width=IMG_W, resized_height=IMG_H, max_value_for_clip_and_normalize=None, out=None):
+        """Converts ROS image to cv2, then to numpy
 
-        return img
+        See ``img_preprocessor`` for the arguments, prefer it when converting a stream of images.
+        """
+        return ImageUtils.img_preprocessor(resized_width, resized_height, max_value_for_clip_and_normalize, out)(img_msg)
+    
+    @staticmethod
+    def process_depth_msg(depth_msg, resized_width=IMG_W, resized_height=IMG_H, max_value_for_clip_and_normalize=None, out=None, dtype=np.float32):
+        """Converts a depth image into numpy array, float32 unless another dtype is requested
 
+        See ``depth_preprocessor`` for the arguments, prefer it when converting a stream of images.
+        """
+        return ImageUtils.depth_preprocessor(resized_width, resized_height, max_value_for_clip_and_normalize, out, dtype)(depth_msg)
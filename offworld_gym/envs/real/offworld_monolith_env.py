@@ -20,8 +20,6 @@ __version__     = version.__version__
 from math import pi
 import time
 import numpy as np
-from scipy.spatial import distance
-from random import randint
 from matplotlib import pyplot as plt
 
 #gym
@@ -45,7 +43,11 @@ class OffWorldMonolithEnv(RealEnv):
         observation_space: Gym data structure that encapsulates an observation.
         action_space: Gym data structure that encapsulates an action.
         step_count: An integer count of step during an episode. 
+        render_fps: Optional maximum number of renders per second in 'human' mode, None renders without waiting.
     """
+    _HANDSHAKE_TIMEOUT_SECONDS = 60
+    _HANDSHAKE_MIN_RETRY_SECONDS = 0.1
+    _HANDSHAKE_MAX_RETRY_SECONDS = 2.0
     
     def __init__(self, experiment_name, resume_experiment, learning_type, algorithm_mode=AlgorithmMode.TRAIN, channel_type=Channels.DEPTH_ONLY):
         super(OffWorldMonolithEnv, self).__init__(experiment_name, resume_experiment, learning_type, algorithm_mode)        
@@ -60,6 +62,9 @@ class OffWorldMonolithEnv(RealEnv):
 
         self._channel_type = channel_type
         self._last_state = None
+        self.render_fps = None
+        self._plot_image = None
+        self._last_plot_time = 0.0
         self._closed = False
         logger.info("Environment has been started.")
 
@@ -68,10 +73,13 @@ class OffWorldMonolithEnv(RealEnv):
         """
         logger.info("Waiting to connect to the environment server.")
         wait_start = time.time()
-        while True:
+        retry_wait = self._HANDSHAKE_MIN_RETRY_SECONDS
+        while time.time() - wait_start < self._HANDSHAKE_TIMEOUT_SECONDS:
             heartbeat, registered, message = self.secured_bridge.perform_handshake(self.experiment_name, self.resume_experiment, self.learning_type, self.algorithm_mode, self.environment_name)
             if heartbeat is None:
-                continue
+                # back off exponentially instead of hammering the server
+                time.sleep(retry_wait)
+                retry_wait = min(retry_wait * 2, self._HANDSHAKE_MAX_RETRY_SECONDS)
             elif heartbeat == SetUpRequest.STATUS_RUNNING and registered:
                 logger.info(message)
                 break
@@ -79,8 +87,8 @@ class OffWorldMonolithEnv(RealEnv):
                 raise GymException(message)
             else:
                 raise GymException("Gym server is not ready.")
-            if time.time() - wait_start > 60:
-                raise GymException("Connect to the environment server timed out.")
+        else:
+            raise GymException("Connect to the environment server timed out.")
         
         logger.info("The environment server is running.")
 
@@ -105,28 +113,41 @@ class OffWorldMonolithEnv(RealEnv):
             None as only human mode is implemented.
         """        
         if mode == 'human':
-            self.plot(self._last_state)
+            self.plot(self._last_state, fps=self.render_fps)
         else:
             pass
         return None
 
-    def plot(self, img, id=1, title="State"):
+    def plot(self, img, id=1, title="State", fps=None):
         """Plot an image in a non-blocking way.
 
+        The figure is created on the first call and updated in place afterwards.
 
         Args:
             img: A numpy array containing the observation.
             id: Numeric id which is assigned to the pyplot figure.
             title: String value which is used as the title.
+            fps: Optional maximum number of plots per second, None plots without waiting.
         """
         if img is not None and isinstance(img, np.ndarray):
-            plt.figure(id)     
-            plt.ion()
-            plt.clf() 
-            plt.imshow(img.squeeze())         
-            plt.title(title)  
-            plt.show(block=False)
-            plt.pause(0.05)
+            if fps is not None:
+                remaining = self._last_plot_time + 1.0 / fps - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+            if self._plot_image is None or self._plot_image.figure.number != id or not plt.fignum_exists(id):
+                plt.ion()
+                figure = plt.figure(id)
+                figure.clf()
+                self._plot_image = figure.gca().imshow(img.squeeze())
+                plt.show(block=False)
+            else:
+                # update the existing image instead of allocating a new one on every render
+                self._plot_image.set_data(img.squeeze())
+                self._plot_image.autoscale()
+            self._plot_image.axes.set_title(title)
+            self._plot_image.figure.canvas.draw_idle()
+            self._plot_image.figure.canvas.flush_events()
+            self._last_plot_time = time.monotonic()
 
     def close(self):
         """Closes the environment.
@@ -150,6 +171,7 @@ class OffWorldMonolithDiscreteEnv(OffWorldMonolithEnv):
         action_space: Gym space box type to represent that environment has 4 discrete actions.
         step_count: An integer count of step during an episode. 
     """ 
+    _ACTION_LUT = tuple(FourDiscreteMotionActions(i) for i in range(4))
 
     def __init__(self, experiment_name, resume_experiment, learning_type, algorithm_mode=AlgorithmMode.TRAIN, channel_type=Channels.DEPTH_ONLY):
         super(OffWorldMonolithDiscreteEnv, self).__init__(experiment_name, resume_experiment, learning_type, algorithm_mode, channel_type)
@@ -174,18 +196,15 @@ class OffWorldMonolithDiscreteEnv(OffWorldMonolithEnv):
         
         assert action is not None, "Action cannot be None."
 
-        # convert float if it's exactly an integer value, otherwise let it throw an error
-        if isinstance(action, (float, np.float32, np.float64)) and float(action).is_integer():
-            action = int(action)
-
-        assert isinstance(action, (FourDiscreteMotionActions, int, np.int32, np.int64)), "Action type is not recognized."
-
         if self._closed:
             raise GymException("The environment has been closed.")
 
-        if isinstance(action, (int, np.int32, np.int64)):
-            assert action >= 0 and action < 4, "Unrecognized value for the action"
-            action = FourDiscreteMotionActions(action)
+        # integer values, including integral floats, are looked up instead of constructing the enum
+        if not isinstance(action, FourDiscreteMotionActions):
+            assert isinstance(action, (int, float, np.integer, np.floating)) and np.isfinite(action), "Action type is not recognized."
+            index = int(action)
+            assert index == action and 0 <= index < len(self._ACTION_LUT), "Unrecognized value for the action"
+            action = self._ACTION_LUT[index]
         
         state, reward, done = self.secured_bridge.monolith_discrete_perform_action(action, self._channel_type, self.algorithm_mode)
         
@@ -0,0 +1,37 @@
+import threading
+import time
+from offworld_gym.envs.common.data_structures import LatestValue
+
+def test_latest_value_get():
+    latest = LatestValue()
+    assert latest.get() is None
+    latest.set(1)
+    latest.set(2)
+    assert latest.get() == 2
+
+def test_latest_value_wait_for_accepted_value():
+    latest = LatestValue()
+    latest.set(3)
+    assert latest.wait_for(lambda value: value > 2, timeout=0.0) == 3
+
+def test_latest_value_wait_for_timeout():
+    latest = LatestValue()
+    assert latest.wait_for(lambda value: True, timeout=0.05) is None
+    latest.set(1)
+    assert latest.wait_for(lambda value: value > 1, timeout=0.05) is None
+
+def test_latest_value_wait_for_notify():
+    latest = LatestValue()
+    latest.set(1)
+    writer = threading.Timer(0.05, latest.set, args=(2,))
+    writer.start()
+    start = time.time()
+    assert latest.wait_for(lambda value: value > 1, timeout=5.0) == 2
+    assert time.time() - start < 5.0
+    writer.join()
+
+if __name__ == "__main__":
+    test_latest_value_get()
+    test_latest_value_wait_for_accepted_value()
+    test_latest_value_wait_for_timeout()
+    test_latest_value_wait_for_notify()